@@ -3,8 +3,10 @@ import qrcode
 from io import BytesIO
 import base64
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from flask import Flask, request, render_template_string, redirect, g
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, or_
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, DateTime, ForeignKey, or_
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 
 app = Flask(__name__)
@@ -18,6 +20,36 @@ Base = declarative_base()
 # Konfigurace relace (session)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --------- Peněžní částky v haléřích ---------
+class Halere(TypeDecorator):
+    """Peněžní částka uložená jako celé číslo v haléřích (1 Kč = 100 haléřů)."""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, int):
+            raise TypeError(f"Částka musí být celé číslo v haléřích, ne {type(value).__name__}")
+        return value
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else int(value)
+
+def na_halere(hodnota):
+    """Převede částku v Kč (např. text z formuláře) na celé haléře."""
+    return int((Decimal(str(hodnota)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def vypocti_odmenu(castka, procento):
+    """Spočítá odměnu v haléřích jako procento z částky v haléřích."""
+    odmena = Decimal(castka) * Decimal(str(procento)) / 100
+    return int(odmena.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+@app.template_filter("kc")
+def halere_na_kc(halere):
+    """Převede haléře na přesnou částku v Kč pro zobrazení."""
+    return Decimal(halere).scaleb(-2)
+
 # --------- Tabulka zákazníků ---------
 class Zakaznik(Base):
     __tablename__ = 'zakaznici'
@@ -28,9 +60,9 @@ class Zakaznik(Base):
     telefon = Column(String)
     typ_odmeny = Column(String)
     hodnota_odmeny = Column(Float)
-    celkove_utraceno = Column(Float, default=0.0)
+    celkove_utraceno = Column(Halere, default=0)
     datum_pridani = Column(DateTime, default=datetime.now)
-    nasbirana_odmena = Column(Float, default=0.0)  # Nové pole pro sledování odměn
+    nasbirana_odmena = Column(Halere, default=0)  # Nové pole pro sledování odměn
     nakupy = relationship("Nakup", back_populates="zakaznik", cascade="all, delete-orphan")
 
 # --------- Tabulka nákupů ---------
@@ -38,11 +70,62 @@ class Nakup(Base):
     __tablename__ = 'nakupy'
     id = Column(Integer, primary_key=True, autoincrement=True)
     zakaznik_id = Column(Integer, ForeignKey("zakaznici.id"))
-    castka = Column(Float)
-    odmena = Column(Float)
+    castka = Column(Halere)
+    odmena = Column(Halere)
     datum = Column(DateTime, default=datetime.now)
     zakaznik = relationship("Zakaznik", back_populates="nakupy")
 
+# --------- Jednorázová migrace částek z Kč (Float) na haléře (Integer) ---------
+VERZE_SCHEMATU = 1
+
+def migruj_na_halere():
+    """Převede starou databázi s částkami ve Float na celé haléře.
+
+    Běží pod zámkem BEGIN IMMEDIATE, takže ji při startu více workerů
+    provede jen jeden z nich. Zůstatky zákazníků se při převodu jednou
+    přepočítají z historie nákupů, dál se už jen průběžně aktualizují.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() >= VERZE_SCHEMATU:
+                conn.exec_driver_sql("ROLLBACK")
+                return
+            if "zakaznici" in inspect(conn).get_table_names():
+                conn.exec_driver_sql("ALTER TABLE nakupy RENAME TO nakupy_float")
+                conn.exec_driver_sql("ALTER TABLE zakaznici RENAME TO zakaznici_float")
+                Base.metadata.create_all(conn)
+                conn.exec_driver_sql("""
+                    INSERT INTO zakaznici (id, jmeno, prijmeni, email, telefon, typ_odmeny,
+                                           hodnota_odmeny, celkove_utraceno, datum_pridani, nasbirana_odmena)
+                    SELECT id, jmeno, prijmeni, email, telefon, typ_odmeny, hodnota_odmeny,
+                           0, datum_pridani, 0
+                    FROM zakaznici_float
+                """)
+                conn.exec_driver_sql("""
+                    INSERT INTO nakupy (id, zakaznik_id, castka, odmena, datum)
+                    SELECT id, zakaznik_id,
+                           CAST(ROUND(COALESCE(castka, 0) * 100) AS INTEGER),
+                           CAST(ROUND(COALESCE(odmena, 0) * 100) AS INTEGER),
+                           datum
+                    FROM nakupy_float
+                """)
+                conn.exec_driver_sql("""
+                    UPDATE zakaznici SET
+                        celkove_utraceno = (SELECT COALESCE(SUM(castka), 0) FROM nakupy
+                                            WHERE nakupy.zakaznik_id = zakaznici.id),
+                        nasbirana_odmena = (SELECT COALESCE(SUM(odmena), 0) FROM nakupy
+                                            WHERE nakupy.zakaznik_id = zakaznici.id)
+                """)
+                conn.exec_driver_sql("DROP TABLE nakupy_float")
+                conn.exec_driver_sql("DROP TABLE zakaznici_float")
+            conn.exec_driver_sql(f"PRAGMA user_version = {VERZE_SCHEMATU}")
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+
+migruj_na_halere()
 Base.metadata.create_all(engine)
 
 # --------- Správa relací pro každý požadavek ---------
@@ -132,8 +215,8 @@ a { text-decoration:none; color:#6c4298; }
 <td>{{ z.prijmeni }}</td>
 <td>{{ z.email }}</td>
 <td>{{ z.telefon }}</td>
-<td>{{ "{:,.0f}".format(z.celkove_utraceno).replace(",", " ") }} Kč</td>
-<td>{{ "{:,.0f}".format(z.nasbirana_odmena).replace(",", " ") }} Kč</td>
+<td>{{ "{:,.0f}".format(z.celkove_utraceno|kc).replace(",", " ") }} Kč</td>
+<td>{{ "{:,.0f}".format(z.nasbirana_odmena|kc).replace(",", " ") }} Kč</td>
 <td>
 <form method="post" action="/delete/{{ z.id }}" style="display:inline"><button type="submit">Smazat</button></form>
 <form method="get" action="/detail/{{ z.id }}" style="display:inline"><button type="submit">Detail</button></form>
@@ -193,7 +276,7 @@ a { text-decoration:none; color:#6c4298; }
 </div>
 <div class="container">
 
-{% if zakaznik.typ_odmeny == 'Cashback' and zakaznik.nasbirana_odmena >= 500 %}
+{% if zakaznik.typ_odmeny == 'Cashback' and zakaznik.nasbirana_odmena|kc >= 500 %}
 <div class="warning-box">
     Pozor! Zákazník má nasbíranou odměnu nad 500 Kč a může ji využít!
 </div>
@@ -203,8 +286,8 @@ a { text-decoration:none; color:#6c4298; }
 <h2>{{ zakaznik.jmeno }} {{ zakaznik.prijmeni }}</h2>
 <p>Email: {{ zakaznik.email }} | Telefon: {{ zakaznik.telefon }}</p>
 <p>Typ odměny: {{ zakaznik.typ_odmeny }} | Hodnota %: {{ zakaznik.hodnota_odmeny }}</p>
-<p>Celkové utraceno: {{ "{:,.0f}".format(zakaznik.celkove_utraceno).replace(",", " ") }} Kč</p>
-<p>Celková nasbíraná odměna: {{ "{:,.0f}".format(zakaznik.nasbirana_odmena).replace(",", " ") }} Kč</p>
+<p>Celkové utraceno: {{ "{:,.0f}".format(zakaznik.celkove_utraceno|kc).replace(",", " ") }} Kč</p>
+<p>Celková nasbíraná odměna: {{ "{:,.0f}".format(zakaznik.nasbirana_odmena|kc).replace(",", " ") }} Kč</p>
 <p><a href="/edit/{{ zakaznik.id }}"><button>Upravit údaje</button></a></p>
 </section>
 
@@ -232,8 +315,8 @@ a { text-decoration:none; color:#6c4298; }
 {% for n in zakaznik.nakupy %}
 <tr>
 <td>{{ loop.index }}</td>
-<td>{{ n.castka }}</td>
-<td>{{ n.odmena }}</td>
+<td>{{ n.castka|kc }}</td>
+<td>{{ n.odmena|kc }}</td>
 <td>{{ n.datum.strftime('%d.%m.%Y %H:%M') }}</td>
 <td>
 <form method="post" action="/delete_odmena/{{ n.id }}" style="display:inline"><button type="submit">Smazat</button></form>
@@ -317,8 +400,8 @@ EDIT_CASTKA_TEMPLATE = """
     <div class="container">
         <h1>Upravit částku nákupu {{ nakup.id }}</h1>
         <form method="post" action="/update_castka/{{ nakup.id }}">
-            <p>Původní částka: {{ nakup.castka }}</p>
-            <input type="number" name="castka" value="{{ nakup.castka }}" step="0.01" required><br>
+            <p>Původní částka: {{ nakup.castka|kc }}</p>
+            <input type="number" name="castka" value="{{ nakup.castka|kc }}" step="0.01" required><br>
             <button type="submit">Uložit změnu</button>
         </form>
         <p><a href="/detail/{{ nakup.zakaznik_id }}">Zpět na detail zákazníka</a></p>
@@ -475,10 +558,7 @@ def index():
         ).all()
     else:
         zakaznici = session.query(Zakaznik).all()
-        
-    for z in zakaznici:
-        z.nasbirana_odmena = sum(n.odmena for n in z.nakupy)
-        
+
     return render_template_string(TEMPLATE, zakaznici=zakaznici, q=q)
 
 @app.route("/add", methods=["POST"])
@@ -509,20 +589,19 @@ def delete(id):
 def detail(id):
     session = get_db_session()
     zakaznik = session.query(Zakaznik).get(id)
-    zakaznik.nasbirana_odmena = sum(n.odmena for n in zakaznik.nakupy)
     return render_template_string(DETAIL_TEMPLATE, zakaznik=zakaznik)
 
 @app.route("/add_nakup/<int:id>", methods=["POST"])
 def add_nakup_detail(id):
     session = get_db_session()
     zakaznik = session.query(Zakaznik).get(id)
-    castka = float(request.form['castka'])
-    vyuzita_odmena = float(request.form.get('vyuzita_odmena', 0))
+    castka = na_halere(request.form['castka'])
+    vyuzita_odmena = na_halere(request.form.get('vyuzita_odmena') or 0)
 
     if vyuzita_odmena > 0:
         zakaznik.nasbirana_odmena -= vyuzita_odmena
     
-    odmena = castka * zakaznik.hodnota_odmeny / 100
+    odmena = vypocti_odmenu(castka, zakaznik.hodnota_odmeny)
     zakaznik.celkove_utraceno += castka
     zakaznik.nasbirana_odmena += odmena
 
@@ -535,11 +614,11 @@ def add_nakup_detail(id):
 def add_bonus_odmena(id):
     session = get_db_session()
     zakaznik = session.query(Zakaznik).get(id)
-    bonus_castka = float(request.form['bonus_castka'])
+    bonus_castka = na_halere(request.form['bonus_castka'])
     
     zakaznik.nasbirana_odmena += bonus_castka
     
-    nakup = Nakup(zakaznik=zakaznik, castka=0.0, odmena=bonus_castka)
+    nakup = Nakup(zakaznik=zakaznik, castka=0, odmena=bonus_castka)
     session.add(nakup)
     session.commit()
     
@@ -574,13 +653,17 @@ def update_castka(nakup_id):
     session = get_db_session()
     nakup = session.query(Nakup).get(nakup_id)
     stara_castka = nakup.castka
-    nova_castka = float(request.form['castka'])
+    nova_castka = na_halere(request.form['castka'])
+    stara_odmena = nakup.odmena
+    nova_odmena = vypocti_odmenu(nova_castka, nakup.zakaznik.hodnota_odmeny)
     
     nakup.zakaznik.celkove_utraceno -= stara_castka
     nakup.zakaznik.celkove_utraceno += nova_castka
+    nakup.zakaznik.nasbirana_odmena -= stara_odmena
+    nakup.zakaznik.nasbirana_odmena += nova_odmena
     
     nakup.castka = nova_castka
-    nakup.odmena = nova_castka * nakup.zakaznik.hodnota_odmeny / 100
+    nakup.odmena = nova_odmena
     
     session.commit()
     return redirect(f"/detail/{nakup.zakaznik_id}")
@@ -590,7 +673,8 @@ def delete_odmena(nakup_id):
     session = get_db_session()
     nakup = session.query(Nakup).get(nakup_id)
     if nakup.odmena > 0:
-        nakup.odmena = 0.0
+        nakup.zakaznik.nasbirana_odmena -= nakup.odmena
+        nakup.odmena = 0
         session.commit()
     return redirect(f"/detail/{nakup.zakaznik_id}")
 
@@ -640,11 +724,11 @@ def add_nakup_obsluha():
     session = get_db_session()
     try:
         zakaznik_id = int(request.form['zakaznik_id'])
-        castka = float(request.form['castka'])
+        castka = na_halere(request.form['castka'])
         
         zakaznik = session.query(Zakaznik).get(zakaznik_id)
         if zakaznik:
-            odmena = castka * (zakaznik.hodnota_odmeny / 100)
+            odmena = vypocti_odmenu(castka, zakaznik.hodnota_odmeny)
             
             nakup = Nakup(zakaznik=zakaznik, castka=castka, odmena=odmena)
             session.add(nakup)